@@ -171,6 +171,10 @@ class BasicSet:
             int(self.ocp.scaleb(3)),
         )
 
+    def off(self) -> "BasicSet":
+        """ Returns SET_CURRENT copy of this preset (as read by GET_CURRENT) which switches output off keeping setpoints """
+        return BasicSet(BasicSetAction(BasicSetOp.SET_CURRENT, self.action.preset), False, self.v_set, self.i_set, self.ovp, self.ocp)
+
 
 def modbus_crc16(data:bytes) -> int:
     crc = 0xFFFF
@@ -274,113 +278,120 @@ class Frame:
         return ", ".join(k + "=" + str(v) for k, v in d.items())
 
 
-with hid.Device(0x2e3c, 0xaf01) as h:
-    logging.info("Device manufacturer: %s", h.manufacturer)
-    logging.info("Product: %s", h.product)
-    logging.info("Serial Number: %s", h.serial)
+def query_off_frame(h: hid.Device) -> bytes:
+    """ Reads current preset and returns pre-encoded BASIC_SET frame which switches output off without changing setpoints """
+    Frame.v(Op.BASIC_SET, BasicSetAction(BasicSetOp.GET_CURRENT, 0)).write(h)
+    _, preset = Frame.read(h)
+    return Frame.v(Op.BASIC_SET, preset.off()).to_bytes()
 
-    Frame.v(Op.DEVICE_INFO).write(h)
-    Frame.read(h)
+if __name__ == "__main__":
+    with hid.Device(0x2e3c, 0xaf01) as h:
+        logging.info("Device manufacturer: %s", h.manufacturer)
+        logging.info("Product: %s", h.product)
+        logging.info("Serial Number: %s", h.serial)
 
-    Frame.v(Op.FIRMWARE_INFO).write(h)
-    Frame.read(h)
+        Frame.v(Op.DEVICE_INFO).write(h)
+        Frame.read(h)
 
-    Frame.v(Op.SYSTEM_INFO).write(h)
-    si: SystemInfo
-    _, si = Frame.read(h)
+        Frame.v(Op.FIRMWARE_INFO).write(h)
+        Frame.read(h)
 
-    b_set = BasicSet(
-        BasicSetAction(BasicSetOp.SET_CURRENT, 0), 
-        False, 
-        Decimal(1), 
-        Decimal(0.01), 
-        Decimal(30.5), 
-        Decimal(5.05)
-    )
+        Frame.v(Op.SYSTEM_INFO).write(h)
+        si: SystemInfo
+        _, si = Frame.read(h)
+
+        b_set = BasicSet(
+            BasicSetAction(BasicSetOp.SET_CURRENT, 0), 
+            False, 
+            Decimal(1), 
+            Decimal(0.01), 
+            Decimal(30.5), 
+            Decimal(5.05)
+        )
 
-    for i in range(5):
-        si.backlight = i
-        Frame.v(Op.SYSTEM_INFO, si).write(h)
-        Frame.read(h)
+        for i in range(5):
+            si.backlight = i
+            Frame.v(Op.SYSTEM_INFO, si).write(h)
+            Frame.read(h)
         
-        b_set.on = True
-        b_set.v_set = Decimal(i)
+            b_set.on = True
+            b_set.v_set = Decimal(i)
 
-        Frame.v(Op.BASIC_SET, b_set).write(h)
-        Frame.read(h)
+            Frame.v(Op.BASIC_SET, b_set).write(h)
+            Frame.read(h)
 
-        Frame.v(Op.BASIC_INFO).write(h)
-        Frame.read(h)
+            Frame.v(Op.BASIC_INFO).write(h)
+            Frame.read(h)
 
-        time.sleep(1)
+            time.sleep(1)
 
-    Frame.v(Op.BASIC_INFO).write(h)
-    Frame.read(h)
+        Frame.v(Op.BASIC_INFO).write(h)
+        Frame.read(h)
 
-    b_set.on = False
-    Frame.v(Op.BASIC_SET, b_set).write(h)
+        b_set.on = False
+        Frame.v(Op.BASIC_SET, b_set).write(h)
 
-    # Frame.v(Operation.SYSTEM_SET).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # Frame.v(Operation.SYSTEM_SET).write(h)
+        # print(Frame.decode(h.read(64, 1)))
 
-    # time.sleep(1)
+        # time.sleep(1)
 
-    # si.backlight = 1
-    # Frame(Operation.SYSTEM_INFO, si).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # si.backlight = 1
+        # Frame(Operation.SYSTEM_INFO, si).write(h)
+        # print(Frame.decode(h.read(64, 1)))
 
-    # Frame(Operation.SYSTEM_SET).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # Frame(Operation.SYSTEM_SET).write(h)
+        # print(Frame.decode(h.read(64, 1)))
 
-    # time.sleep(1)
+        # time.sleep(1)
 
-    # si.backlight = 2
-    # Frame(Operation.SYSTEM_INFO, si).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # si.backlight = 2
+        # Frame(Operation.SYSTEM_INFO, si).write(h)
+        # print(Frame.decode(h.read(64, 1)))
 
-    # Frame(Operation.SYSTEM_SET).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # Frame(Operation.SYSTEM_SET).write(h)
+        # print(Frame.decode(h.read(64, 1)))
 
 
-    # Frame(Operation.BASIC_SET, BasicSetAction(BasicSetOp.GET_CURRENT, 0)).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # Frame(Operation.BASIC_SET, BasicSetAction(BasicSetOp.GET_CURRENT, 0)).write(h)
+        # print(Frame.decode(h.read(64, 1)))
 
-    # Frame(Operation.BASIC_SET, BasicSetAction(BasicSetOp.USE_PRESET, 2)).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # Frame(Operation.BASIC_SET, BasicSetAction(BasicSetOp.USE_PRESET, 2)).write(h)
+        # print(Frame.decode(h.read(64, 1)))
 
-    # Frame(Operation.BASIC_SET, BasicSetAction(BasicSetOp.GET_CURRENT, 0)).write(h)
-    # preset: BasicSet
-    # frame, preset = Frame.decode(h.read(64, 1))
-    # preset.action.op = BasicSetOp.SET_CURRENT
-    # preset.on = True
+        # Frame(Operation.BASIC_SET, BasicSetAction(BasicSetOp.GET_CURRENT, 0)).write(h)
+        # preset: BasicSet
+        # frame, preset = Frame.decode(h.read(64, 1))
+        # preset.action.op = BasicSetOp.SET_CURRENT
+        # preset.on = True
 
-    # Frame(Operation.BASIC_SET, preset).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # Frame(Operation.BASIC_SET, preset).write(h)
+        # print(Frame.decode(h.read(64, 1)))
     
 
-    # Frame(Operation.BASIC_SET, preset).write(h)
-    # Frame.decode(h.read(64, 1))
+        # Frame(Operation.BASIC_SET, preset).write(h)
+        # Frame.decode(h.read(64, 1))
 
-    # time.sleep(1)
+        # time.sleep(1)
 
-    # Frame(Operation.BASIC_SET, 0, BasicSet(
-    #     BasicSetAction(BasicSetOp.SET_CURRENT, 0), 
-    #     False, 
-    #     Decimal(5), 
-    #     Decimal(0.1), 
-    #     Decimal(30.5), 
-    #     Decimal(5.05)
-    # )).write(h)
-    # print(Frame.decode(h.read(64, 1)))
+        # Frame(Operation.BASIC_SET, 0, BasicSet(
+        #     BasicSetAction(BasicSetOp.SET_CURRENT, 0), 
+        #     False, 
+        #     Decimal(5), 
+        #     Decimal(0.1), 
+        #     Decimal(30.5), 
+        #     Decimal(5.05)
+        # )).write(h)
+        # print(Frame.decode(h.read(64, 1)))
 
-    # for p in range(10):
-    #     print(f"Preset [{p}]")
-    #     Frame(Operation.BASIC_SET, 0, BasicSetAction(BasicSetOp.GET_PRESET, p)).write(h)
-    #     print(Frame.decode(h.read(64, 1)))
+        # for p in range(10):
+        #     print(f"Preset [{p}]")
+        #     Frame(Operation.BASIC_SET, 0, BasicSetAction(BasicSetOp.GET_PRESET, p)).write(h)
+        #     print(Frame.decode(h.read(64, 1)))
 
-    # h.write()
+        # h.write()
 
-    # while True:
-    #     h.write(Frame(Operation.BASIC_INFO, 0, b"").to_bytes())
-    #     print(Frame.decode(h.read(64, 1)))
-    #     time.sleep(1)
+        # while True:
+        #     h.write(Frame(Operation.BASIC_INFO, 0, b"").to_bytes())
+        #     print(Frame.decode(h.read(64, 1)))
+        #     time.sleep(1)
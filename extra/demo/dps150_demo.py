@@ -237,51 +237,52 @@ def read_frames(port: serial.Serial):
         pass
 
 
-with serial.Serial(
-    port='/dev/ttyACM0',
-    baudrate=19200,
-    parity=serial.PARITY_NONE,
-    stopbits=serial.STOPBITS_ONE,
-    bytesize=serial.EIGHTBITS,
-    timeout=0.1
-) as port:
-
-    logging.info("LOCK")
-    Frame.v(Action.LOCK, Field.NONE, True).write(port)
-    try:
-
-        baud_rate_value = BAUD_RATES.get(port.baudrate, 0)
-        logging.info("READ INIT DATA, BAUDRATE = %s", baud_rate_value)
-
-        # Frame.v(Action.BAUD, Field.NONE, baud_rate_value).write(port)
-        Frame.v(Action.GET, Field.MODEL_NAME).write(port)
-        Frame.v(Action.GET, Field.FIRMWARE_VERSION).write(port)
-        Frame.v(Action.GET, Field.HARDWARE_VERSION).write(port)
-        Frame.v(Action.GET, Field.STATE).write(port)
-        Frame.v(Action.GET, Field.IDENTIFIER).write(port)
-        Frame.v(Action.GET, Field.CC_CV).write(port)
-        Frame.v(Action.SET, Field.METERING, True).write(port)
-        Frame.v(Action.GET, Field.BRIGHTNESS).write(port)
-        Frame.v(Action.GET, Field.VOLUME).write(port)
-        Frame.v(Action.GET, Field.ALL).write(port)
+if __name__ == "__main__":
+    with serial.Serial(
+        port='/dev/ttyACM0',
+        baudrate=19200,
+        parity=serial.PARITY_NONE,
+        stopbits=serial.STOPBITS_ONE,
+        bytesize=serial.EIGHTBITS,
+        timeout=0.1
+    ) as port:
+
+        logging.info("LOCK")
+        Frame.v(Action.LOCK, Field.NONE, True).write(port)
+        try:
+
+            baud_rate_value = BAUD_RATES.get(port.baudrate, 0)
+            logging.info("READ INIT DATA, BAUDRATE = %s", baud_rate_value)
+
+            # Frame.v(Action.BAUD, Field.NONE, baud_rate_value).write(port)
+            Frame.v(Action.GET, Field.MODEL_NAME).write(port)
+            Frame.v(Action.GET, Field.FIRMWARE_VERSION).write(port)
+            Frame.v(Action.GET, Field.HARDWARE_VERSION).write(port)
+            Frame.v(Action.GET, Field.STATE).write(port)
+            Frame.v(Action.GET, Field.IDENTIFIER).write(port)
+            Frame.v(Action.GET, Field.CC_CV).write(port)
+            Frame.v(Action.SET, Field.METERING, True).write(port)
+            Frame.v(Action.GET, Field.BRIGHTNESS).write(port)
+            Frame.v(Action.GET, Field.VOLUME).write(port)
+            Frame.v(Action.GET, Field.ALL).write(port)
         
-        read_frames(port)
-
-        Frame.v(Action.SET, Field.V_SET, 1.9).write(port)
-        for i in range(1,5):
             read_frames(port)
 
-        Frame.v(Action.SET, Field.RUNNING, True).write(port)
+            Frame.v(Action.SET, Field.V_SET, 1.9).write(port)
+            for i in range(1,5):
+                read_frames(port)
+
+            Frame.v(Action.SET, Field.RUNNING, True).write(port)
         
-        for i in range(1,5):
-            read_frames(port)
-            time.sleep(1)
+            for i in range(1,5):
+                read_frames(port)
+                time.sleep(1)
 
-        Frame.v(Action.SET, Field.RUNNING, False).write(port)
-        for i in range(1,5):
-            read_frames(port)
+            Frame.v(Action.SET, Field.RUNNING, False).write(port)
+            for i in range(1,5):
+                read_frames(port)
 
-    finally:
-        logging.info("UNLOCK")
-        Frame.v(Action.LOCK, Field.NONE, False).write(port)
+        finally:
+            logging.info("UNLOCK")
+            Frame.v(Action.LOCK, Field.NONE, False).write(port)
 
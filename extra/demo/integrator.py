@@ -0,0 +1,296 @@
+import time
+import math
+import array
+import logging
+import statistics
+
+import utils
+
+SECONDS_PER_HOUR = 3600.0
+PERIOD_WARMUP = 8 # Intervals used to estimate telemetry period (median) and to confirm rate change
+PERIOD_EMA_ALPHA = 0.05 # Smoothing factor of estimated telemetry period
+
+class EnergyIntegrator:
+    """
+    Host-side capacity (Ah) and energy (Wh) counter computed from sampled voltage and current.
+
+    Samples are integrated with trapezoidal rule in O(1) per sample and stored in preallocated
+    ring buffers of raw doubles (no per-sample Python objects are kept).
+    Cumulative totals are stored alongside samples, so rolling window totals are O(1) too.
+
+    DPS-150 `CAPACITY`/`ENERGY` counters have coarse resolution and DP100 has no such counters at all,
+    so this can be fed from either `Measurement` (DPS-150) or `BasicInfo.v_out`/`i_out` (DP100).
+
+    Without `expected_period` telemetry period is estimated from sample intervals,
+    PERIOD_WARMUP consecutive gaps of similar length are treated as rate change (and not counted as gaps).
+
+    numpy is optional (like serial/hid for device demos) and only required by `samples` and `reintegrate`.
+    """
+
+    def __init__(self, window: float = 60.0, capacity: int = 65536,
+                 expected_period: float | None = None, gap_factor: float = 1.5):
+        if expected_period is not None:
+            capacity = max(capacity, math.ceil(window / expected_period) + 1)
+
+        self.window = window # Rolling window length (seconds)
+        self.capacity = capacity # Max stored samples, must cover `window` at full telemetry rate
+        self.expected_period = expected_period # Telemetry period (seconds), estimated from intervals if None
+        self.gap_factor = gap_factor # Interval longer than period * gap_factor is a gap
+
+        zeros = bytes(8 * capacity)
+        self._warmup = array.array("d", bytes(8 * PERIOD_WARMUP)) # First intervals used for period estimation
+        self._t = array.array("d", zeros)
+        self._v = array.array("d", zeros)
+        self._i = array.array("d", zeros)
+        self._ah = array.array("d", zeros) # Cumulative capacity at each sample
+        self._wh = array.array("d", zeros) # Cumulative energy at each sample
+        self.reset()
+
+    def reset(self):
+        """ Starts new session """
+        self.count = 0 # Total accepted samples in session
+        self.tail = 0 # Absolute number of oldest sample inside rolling window
+        self.ah = 0.0
+        self.wh = 0.0
+        self.gaps = 0 # Number of detected gaps
+        self.missed = 0 # Estimated number of missed samples
+        self.rejected = 0 # Samples rejected due to non-monotonic timestamp
+        self.truncated = 0 # Samples still inside rolling window which were overwritten (capacity too small)
+        self.period = self.expected_period # Telemetry period used for gap detection
+        self._period_count = 0 # Intervals collected during warm-up
+        self._run_count = 0 # Consecutive gap intervals of similar length (possible rate change)
+        self._run_min = 0.0
+        self._run_max = 0.0
+        self._run_sum = 0.0
+        self._run_gaps = 0
+        self._run_missed = 0
+        self._last_t = -math.inf
+        self._last_v = 0.0
+        self._last_i = 0.0
+
+    def add(self, v: float, i: float, t: float | None = None) -> bool:
+        """
+        Adds sample. `t` must be monotonic timestamp in seconds (defaults to `time.monotonic()`).
+        Returns False if sample was rejected.
+        """
+        if t is None:
+            t = time.monotonic()
+
+        dt = t - self._last_t
+        if dt <= 0:
+            self.rejected += 1
+            return False
+
+        if self.count > 0:
+            self._detect_gap(dt)
+            self.ah += (i + self._last_i) * dt / (2 * SECONDS_PER_HOUR)
+            self.wh += (v * i + self._last_v * self._last_i) * dt / (2 * SECONDS_PER_HOUR)
+
+        evicted = self.count - self.capacity
+        if evicted >= self.tail and self._t[evicted % self.capacity] >= t - self.window:
+            if self.truncated == 0:
+                logging.warning("Integrator. Capacity %d can't hold %.3f s window", self.capacity, self.window)
+            self.truncated += 1
+
+        pos = self.count % self.capacity
+        self._t[pos] = t
+        self._v[pos] = v
+        self._i[pos] = i
+        self._ah[pos] = self.ah
+        self._wh[pos] = self.wh
+        self.count += 1
+        self._last_t = t
+        self._last_v = v
+        self._last_i = i
+
+        start = t - self.window
+        self.tail = max(self.tail, self.count - self.capacity)
+        while self._t[self.tail % self.capacity] < start:
+            self.tail += 1
+        return True
+
+    def _detect_gap(self, dt: float):
+        if self.period is None:
+            # Warm-up: period is median of first intervals, so single long pause doesn't spoil it
+            self._warmup[self._period_count] = dt
+            self._period_count += 1
+            if self._period_count == PERIOD_WARMUP:
+                self.period = statistics.median(self._warmup)
+                for interval in self._warmup:
+                    self._count_gap(interval)
+                self._run_count = 0
+            return
+
+        if self._count_gap(dt):
+            return
+        self._run_count = 0
+        if self.expected_period is None:
+            self.period += PERIOD_EMA_ALPHA * (dt - self.period)
+
+    def _count_gap(self, dt: float) -> bool:
+        if dt <= self.period * self.gap_factor:
+            return False
+
+        missed = max(1, round(dt / self.period) - 1)
+        self.gaps += 1
+        self.missed += missed
+        logging.debug("Integrator. Gap of %.3f s detected", dt)
+        if self.expected_period is not None:
+            return True
+
+        if self._run_count > 0 and max(self._run_max, dt) <= min(self._run_min, dt) * self.gap_factor:
+            self._run_count += 1
+            self._run_min = min(self._run_min, dt)
+            self._run_max = max(self._run_max, dt)
+            self._run_sum += dt
+            self._run_gaps += 1
+            self._run_missed += missed
+        else:
+            self._run_count = 1
+            self._run_min = self._run_max = self._run_sum = dt
+            self._run_gaps = 1
+            self._run_missed = missed
+
+        if self._run_count >= PERIOD_WARMUP:
+            # Consistent "gaps" mean telemetry rate has changed
+            logging.debug("Integrator. Telemetry period changed %.3f -> %.3f s", self.period, self._run_sum / self._run_count)
+            self.period = self._run_sum / self._run_count
+            self.gaps -= self._run_gaps
+            self.missed -= self._run_missed
+            self._run_count = 0
+        return True
+
+    def window_totals(self) -> tuple[float, float]:
+        """ Returns (Ah, Wh) accumulated inside rolling window """
+        if self.count == 0:
+            return (0.0, 0.0)
+        tail = self.tail % self.capacity
+        return (self.ah - self._ah[tail], self.wh - self._wh[tail])
+
+    def window_span(self) -> float:
+        """ Returns length (seconds) actually covered by `window_totals`, less than `window` if `truncated` """
+        if self.count == 0:
+            return 0.0
+        return self._last_t - self._t[self.tail % self.capacity]
+
+    def session_totals(self) -> tuple[float, float]:
+        """ Returns (Ah, Wh) accumulated since last `reset` """
+        return (self.ah, self.wh)
+
+    def samples(self, window: float | None = None):
+        """ Returns copies of stored samples as (t, v, i) numpy arrays in chronological order """
+        import numpy as np
+
+        first = max(0, self.count - self.capacity)
+        if window is not None and self.count > 0:
+            start = self._last_t - window
+            t = np.frombuffer(self._t)
+            begin = first % self.capacity
+            ordered = np.concatenate((t[begin:], t[:begin])) if self.count > self.capacity else t[:self.count]
+            first += int(np.searchsorted(ordered, start))
+
+        result = []
+        for buffer in (self._t, self._v, self._i):
+            data = np.frombuffer(buffer)
+            begin, end = first % self.capacity, self.count % self.capacity
+            if first == self.count:
+                result.append(data[:0].copy())
+            elif begin < end:
+                result.append(data[begin:end].copy())
+            else:
+                result.append(np.concatenate((data[begin:], data[:end])))
+        return tuple(result)
+
+    def reintegrate(self, window: float | None = None) -> tuple[float, float]:
+        """
+        Vectorized trapezoidal re-integration over stored samples (whole buffer or last `window` seconds).
+        Returns (Ah, Wh). Requires numpy.
+        """
+        import numpy as np
+
+        t, v, i = self.samples(window)
+        if len(t) < 2:
+            return (0.0, 0.0)
+        dt = np.diff(t)
+        p = v * i
+        ah = float(np.dot(i[1:] + i[:-1], dt)) / (2 * SECONDS_PER_HOUR)
+        wh = float(np.dot(p[1:] + p[:-1], dt)) / (2 * SECONDS_PER_HOUR)
+        return (ah, wh)
+
+
+def benchmark(devices: int = 8, samples: int = 100000, period: float = 0.001):
+    """ Feeds synthetic telemetry to several integrators and compares incremental and vectorized results """
+    integrators = [EnergyIntegrator(window=10.0, capacity=16384, expected_period=period) for _ in range(devices)]
+
+    started = time.perf_counter()
+    for n in range(samples):
+        t = n * period
+        if n % 1000 == 999:
+            continue # simulate missed sample
+        for k, integrator in enumerate(integrators):
+            integrator.add(5.0 + k, 0.5 + 0.1 * math.sin(t), t)
+    elapsed = time.perf_counter() - started
+
+    integrator = integrators[0]
+    logging.info("Integrator. %d samples in %.3f s (%.0f samples/s)",
+                 devices * samples, elapsed, devices * samples / elapsed)
+    logging.info("Integrator. Session: %.6f Ah, %.6f Wh, gaps=%d, missed=%d",
+                 *integrator.session_totals(), integrator.gaps, integrator.missed)
+    logging.info("Integrator. Window: %.6f Ah, %.6f Wh, span=%.3f s, truncated=%d",
+                 *integrator.window_totals(), integrator.window_span(), integrator.truncated)
+    logging.info("Integrator. Window (reintegrated): %.6f Ah, %.6f Wh", *integrator.reintegrate(integrator.window))
+
+
+def check():
+    """ Checks ring buffer wrap, truncation, window ordering and gap detection """
+    import numpy as np
+
+    logging.disable(logging.CRITICAL)
+    try:
+        # Wrapped ring buffer: window totals and reintegration agree, samples are chronological copies
+        e = EnergyIntegrator(window=5.0, capacity=64, expected_period=0.125)
+        for n in range(200):
+            e.add(2.0, 0.5 + n % 7 * 0.1, n * 0.125)
+        t, v, i = e.samples(2.0)
+        assert np.all(np.diff(t) > 0) and t[0] == 22.875 and t[-1] == 24.875
+        assert np.allclose(e.window_totals(), e.reintegrate(e.window)) and math.isclose(e.window_span(), 5.0)
+        assert e.truncated == 0 and e.gaps == 0
+        e = EnergyIntegrator(capacity=16)
+        for n in range(4):
+            e.add(1.0, 1.0, float(n))
+        t, v, i = e.samples()
+        e.reset()
+        e.add(1.0, 1.0, 100.0)
+        assert list(t) == [0.0, 1.0, 2.0, 3.0]
+
+        # Too small capacity: truncation is counted and span is shorter than window
+        e = EnergyIntegrator(window=60.0, capacity=100)
+        for n in range(1000):
+            e.add(1.0, 1.0, n * 0.1)
+        assert e.truncated > 0 and e.window_span() < e.window
+
+        # Estimated period: missed sample is a gap, rate change is not
+        e = EnergyIntegrator()
+        for n in range(200):
+            if n != 150:
+                e.add(1.0, 1.0, n * 0.01)
+        assert (e.gaps, e.missed) == (1, 1)
+        t = 2.0
+        for n in range(1000):
+            t += 0.05
+            e.add(1.0, 1.0, t)
+        assert (e.gaps, e.missed) == (1, 1) and math.isclose(e.period, 0.05)
+
+        # Long pause during warm-up is detected too
+        e = EnergyIntegrator()
+        e.add(1.0, 1.0, 0.0)
+        for n in range(100):
+            e.add(1.0, 1.0, 1.0 + n * 0.1)
+        assert e.gaps == 1 and math.isclose(e.period, 0.1)
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    check()
+    benchmark()
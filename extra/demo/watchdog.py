@@ -0,0 +1,408 @@
+import time
+import random
+import threading
+import logging
+import statistics
+
+from typing import Callable, Any
+from dataclasses import dataclass, field
+
+import utils
+
+# Protection state value which means "no protection triggered".
+# Both DPS-150 (State.NONE) and DP100 (State.OK) use zero for it.
+STATE_OK = 0
+
+@dataclass
+class Limits:
+    max_temperature: float | None = None # Trip when temperature (C) is above this value
+    min_input_voltage: float | None = None # Trip when input voltage (V) drops below this value
+    max_input_voltage: float | None = None # Trip when input voltage (V) rises above this value
+    max_silence: float = 0.5 # Trip when no telemetry received during this period (seconds)
+
+@dataclass
+class Device:
+    name: str
+    write: Callable[[bytes], Any] # Transport write function (port.write / h.write)
+    off_frame: bytes # Pre-encoded frame which switches output off
+    limits: Limits
+    last_seen: float = 0.0
+    tripped: str | None = None # Trip reason when off frame was written, None if device is armed
+    pending: str | None = None # Trip reason while off frame is not written yet (retried by monitor thread)
+    pending_since: float = 0.0 # Last failed attempt to write off frame
+    writing: bool = False # Off frame write is in progress (no concurrent writes to same port)
+    trip: "Trip | None" = None # Trip which switched (or is switching) device off
+
+@dataclass
+class Trip:
+    device: str # Device which caused trip
+    reason: str
+    detected_at: float # time.perf_counter() timestamp of detection
+    targets: list[str] = field(default_factory=list) # Devices which must be switched off
+    switched_off: list[str] = field(default_factory=list) # Devices which received off frame
+    latency: float = 0.0 # Seconds between detection and last off frame written
+
+    @property
+    def complete(self) -> bool:
+        """ True when every target received off frame (`latency` is final) """
+        return len(self.switched_off) == len(self.targets)
+
+
+class Watchdog:
+    """
+    Monitors protection state, temperature and input voltage of connected devices.
+
+    Telemetry is checked synchronously in `update`, so detection latency is bounded by the telemetry rate.
+    Devices which stop reporting are tripped by the monitor thread after `Limits.max_silence`,
+    so any fault is detected within `max_silence + period` seconds even if telemetry is lost.
+
+    On trip all devices sharing an interlock group with tripped device are switched off
+    using pre-encoded frames (no encoding work on the trip path).
+    Device stays pending until its off frame is written, failed writes are retried every `period`.
+    """
+
+    def __init__(self, period: float = 0.01, on_trip: Callable[[Trip], Any] | None = None):
+        self.period = period
+        self.on_trip = on_trip
+        self.devices: dict[str, Device] = {}
+        self.groups: dict[str, set[str]] = {}
+        self.trips: list[Trip] = []
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_device(self, name: str, write: Callable[[bytes], Any], off_frame: bytes, limits: Limits | None = None):
+        with self._lock:
+            self.devices[name] = Device(name, write, off_frame, limits or Limits(), time.perf_counter())
+
+    def add_group(self, name: str, members: list[str]):
+        with self._lock:
+            unknown = [m for m in members if m not in self.devices]
+            if unknown:
+                raise RuntimeError(f"Watchdog. Unknown devices in interlock group {name}: {unknown}")
+            self.groups[name] = set(members)
+
+    def interlocked(self, name: str) -> set[str]:
+        """ Returns all devices which must be switched off when `name` trips (including `name` itself) """
+        result = {name}
+        for members in self.groups.values():
+            if name in members:
+                result |= members
+        return result
+
+    def update(self, name: str,
+               state: int | None = None,
+               temperature: float | None = None,
+               input_voltage: float | None = None) -> Trip | None:
+        """
+        Feeds telemetry of device `name`. Any of values can be omitted (DPS-150 pushes them as separate fields).
+        For DP100 pass `BasicInfo.state`, `max(temp1, temp2)` and `v_in`.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            device = self.devices[name]
+            device.last_seen = now
+            if device.tripped is not None or device.pending is not None:
+                return None
+
+            limits = device.limits
+            reason = None
+            if state is not None and int(state) != STATE_OK:
+                reason = f"protection {state}"
+            elif temperature is not None and limits.max_temperature is not None and temperature > limits.max_temperature:
+                reason = f"temperature {temperature} > {limits.max_temperature}"
+            elif input_voltage is not None and limits.min_input_voltage is not None and input_voltage < limits.min_input_voltage:
+                reason = f"input voltage {input_voltage} < {limits.min_input_voltage}"
+            elif input_voltage is not None and limits.max_input_voltage is not None and input_voltage > limits.max_input_voltage:
+                reason = f"input voltage {input_voltage} > {limits.max_input_voltage}"
+
+            if reason is None:
+                return None
+            trip = self._arm(Trip(name, reason, now))
+
+        return self._switch_off(trip)
+
+    def trip(self, name: str, reason: str, detected_at: float | None = None) -> Trip:
+        with self._lock:
+            trip = self._arm(Trip(name, reason, detected_at if detected_at is not None else time.perf_counter()))
+        return self._switch_off(trip)
+
+    def _arm(self, trip: Trip) -> Trip:
+        """ Marks interlocked devices as pending off and adds them to trip targets (tripped device first). Must be called under lock """
+        for target in sorted(self.interlocked(trip.device), key=lambda n: n != trip.device):
+            device = self.devices[target]
+            if target != trip.device and (device.tripped is not None or device.pending is not None):
+                continue
+            device.pending = trip.reason if target == trip.device else f"interlock by {trip.device}"
+            device.pending_since = trip.detected_at
+            device.trip = trip
+            trip.targets.append(target)
+        self.trips.append(trip)
+        return trip
+
+    def _write_off(self, name: str) -> bool:
+        """ Writes off frame unless another write to device is in progress. Returns True if device was switched off """
+        device = self.devices[name]
+        with self._lock:
+            if device.writing or device.pending is None:
+                return False
+            device.writing = True
+
+        try:
+            device.write(device.off_frame)
+            written = True
+        except Exception:
+            logging.exception("Watchdog. Unable to switch off %s", name)
+            written = False
+
+        with self._lock:
+            device.writing = False
+            if not written:
+                device.pending_since = time.perf_counter()
+                return False
+            if device.pending is None: # reset during write
+                return True
+            device.tripped = device.pending
+            device.pending = None
+            trip = device.trip
+            trip.switched_off.append(name)
+            trip.latency = time.perf_counter() - trip.detected_at
+        return True
+
+    def _switch_off(self, trip: Trip) -> Trip:
+        for target in trip.targets:
+            self._write_off(target)
+
+        logging.warning("Watchdog. TRIP %s: %s, switched off %s of %s in %.3f ms",
+                        trip.device, trip.reason, trip.switched_off, trip.targets, trip.latency * 1000)
+        if self.on_trip is not None:
+            self.on_trip(trip)
+        return trip
+
+    def reset(self, name: str):
+        """ Re-arms device after trip """
+        with self._lock:
+            device = self.devices[name]
+            device.tripped = None
+            device.pending = None
+            device.trip = None
+            device.last_seen = time.perf_counter()
+
+    def check_silence(self):
+        """ Trips devices without telemetry and retries off frames which were not written """
+        now = time.perf_counter()
+        trips = []
+        retries = []
+        with self._lock:
+            for device in self.devices.values():
+                if device.pending is not None:
+                    if not device.writing and now - device.pending_since >= self.period:
+                        retries.append(device.name)
+                    continue
+                silence = now - device.last_seen
+                if device.tripped is None and silence > device.limits.max_silence:
+                    trips.append(self._arm(Trip(device.name, f"no telemetry for {silence:.3f} s", now)))
+
+        for name in retries:
+            if self._write_off(name):
+                trip = self.devices[name].trip
+                logging.warning("Watchdog. %s switched off after retry, trip %s latency %.3f ms",
+                                name, trip.device, trip.latency * 1000)
+        for trip in trips:
+            self._switch_off(trip)
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            self.check_silence()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "Watchdog":
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def latency_stats(self) -> dict[str, float]:
+        """ Trip-to-off latency of completed trips (all targets switched off) """
+        with self._lock:
+            latencies = [t.latency for t in self.trips if t.complete]
+        if not latencies:
+            return {}
+        return {
+            "count": len(latencies),
+            "min_ms": min(latencies) * 1000,
+            "avg_ms": statistics.fmean(latencies) * 1000,
+            "max_ms": max(latencies) * 1000,
+        }
+
+
+class SimulatedDevice:
+    """ Device simulator which pushes telemetry to watchdog and accepts off frame """
+
+    def __init__(self, watchdog: Watchdog, name: str, off_frame: bytes, period: float = 0.005):
+        self.watchdog = watchdog
+        self.name = name
+        self.off_frame = off_frame
+        self.period = period
+        self.running = True
+        self.state = STATE_OK
+        self.temperature = 25.0
+        self.input_voltage = 20.0
+        self.fault_at: float | None = None
+        self.off_at: float | None = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"sim-{name}", daemon=True)
+
+    def write(self, data: bytes):
+        if data == self.off_frame and self.running:
+            self.running = False
+            self.off_at = time.perf_counter()
+
+    def fault(self, state: int):
+        self.fault_at = time.perf_counter()
+        self.state = state
+
+    def _run(self):
+        while not self._stop.wait(self.period):
+            self.watchdog.update(self.name, self.state, self.temperature, self.input_voltage)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def simulate(trials: int = 100, telemetry_period: float = 0.005, timeout: float = 1.0) -> dict[str, float]:
+    """
+    Measures trip-to-off latency: time between fault appearing on simulated device
+    and off frame received by every device in its interlock group.
+    Fault is injected at random point of telemetry period, so detection delay is included.
+    """
+    import dps150_demo
+    import dp100_demo
+    from decimal import Decimal
+
+    dps150_off = dps150_demo.Frame.v(dps150_demo.Action.SET, dps150_demo.Field.RUNNING, False).to_bytes()
+    # Current preset as simulated DP100 would report it for BasicSetOp.GET_CURRENT,
+    # real devices should use dp100_demo.query_off_frame() to keep user setpoints
+    dp100_preset = dp100_demo.BasicSet(
+        dp100_demo.BasicSetAction(dp100_demo.BasicSetOp.GET_CURRENT, 0),
+        True,
+        Decimal(5),
+        Decimal("0.1"),
+        Decimal("30.5"),
+        Decimal("5.05")
+    )
+    dp100_off = dp100_demo.Frame.v(dp100_demo.Op.BASIC_SET, dp100_preset.off()).to_bytes()
+
+    latencies = []
+    for _ in range(trials):
+        with Watchdog() as wd:
+            sims = [
+                SimulatedDevice(wd, "dps150-1", dps150_off, telemetry_period),
+                SimulatedDevice(wd, "dps150-2", dps150_off, telemetry_period),
+                SimulatedDevice(wd, "dp100-1", dp100_off, telemetry_period),
+                SimulatedDevice(wd, "dp100-2", dp100_off, telemetry_period),
+            ]
+            for sim in sims:
+                wd.add_device(sim.name, sim.write, sim.off_frame, Limits(max_temperature=80, min_input_voltage=5))
+            wd.add_group("bench", ["dps150-1", "dp100-1"])
+            wd.add_group("aux", ["dps150-2", "dp100-2"])
+            for sim in sims:
+                sim.start()
+
+            time.sleep(telemetry_period * 4 + random.uniform(0, telemetry_period))
+            sims[0].fault(dps150_demo.State.OCP)
+            deadline = time.perf_counter() + timeout
+            while (sims[0].running or sims[2].running) and time.perf_counter() < deadline:
+                time.sleep(telemetry_period / 10)
+
+            for sim in sims:
+                sim.stop()
+            if sims[0].running or sims[2].running:
+                raise RuntimeError(f"Watchdog. Simulated devices were not switched off in {timeout} s")
+            latencies.append(max(sims[0].off_at, sims[2].off_at) - sims[0].fault_at)
+
+    return {
+        "trials": trials,
+        "telemetry_period_ms": telemetry_period * 1000,
+        "min_ms": min(latencies) * 1000,
+        "avg_ms": statistics.fmean(latencies) * 1000,
+        "p95_ms": statistics.quantiles(latencies, n=100, method="inclusive")[94] * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def check():
+    """ Checks pending/retry logic with failing and slow transports """
+    logging.disable(logging.CRITICAL)
+    try:
+        # Failed off frame keeps device pending and is retried by monitor
+        fail = True
+        writes = []
+        def flaky_write(data: bytes):
+            writes.append(data)
+            if fail:
+                raise OSError("write failed")
+
+        wd = Watchdog(period=0.001)
+        wd.add_device("a", flaky_write, b"off-a")
+        wd.add_device("b", lambda data: None, b"off-b")
+        wd.add_group("g", ["a", "b"])
+        trip = wd.update("a", state=1)
+        assert trip.targets == ["a", "b"] and trip.switched_off == ["b"] and not trip.complete
+        assert wd.devices["a"].pending is not None and wd.devices["a"].tripped is None
+        assert wd.update("a", state=1) is None and wd.latency_stats() == {}
+
+        time.sleep(0.002)
+        wd.check_silence()
+        assert len(writes) == 2 and wd.devices["a"].pending is not None
+
+        fail = False
+        time.sleep(0.002)
+        wd.check_silence()
+        assert wd.devices["a"].tripped is not None and wd.devices["a"].pending is None
+        assert trip.complete and trip.switched_off == ["b", "a"] and trip.latency >= 0.004
+        assert wd.latency_stats()["count"] == 1
+
+        # Slow write is never retried concurrently
+        active = 0
+        overlaps = 0
+        def slow_write(data: bytes):
+            nonlocal active, overlaps
+            active += 1
+            overlaps += active > 1
+            time.sleep(0.05)
+            active -= 1
+
+        with Watchdog(period=0.001) as wd:
+            wd.add_device("slow", slow_write, b"off")
+            trip = wd.trip("slow", "test")
+        assert overlaps == 0 and trip.complete
+
+        # p95 never exceeds max
+        metrics = simulate(trials=5, telemetry_period=0.02)
+        assert metrics["min_ms"] <= metrics["p95_ms"] <= metrics["max_ms"]
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    check()
+    logging.getLogger().setLevel(logging.ERROR)
+    metrics = simulate()
+    logging.getLogger().setLevel(logging.INFO)
+    logging.info("Trip-to-off latency: %s", ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in metrics.items()))